@@ -82,7 +82,7 @@ async def create_download(
         )
     try:
         # SECURITY: Sanitize URL to prevent command injection
-        download_request.url = sanitize_url(download_request.url)
+        download_request.url = sanitize_url(str(download_request.url))
         logger.info(f"Creating download for URL: {download_request.url}")
 
         # SECURITY: Check disk space before allowing download
@@ -119,27 +119,35 @@ async def create_download(
         )
 
 
-@router.get("/", response_model=List[DownloadResponse])
+@router.get("/", response_model=List[DownloadResponse],
+            response_model_exclude_none=True)
 async def get_all_downloads(
-    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    skip: int = Query(0, ge=0, deprecated=True,
+                      description="Number of records to skip (deprecated; use before_id)"),
     limit: int = Query(100, ge=1, le=1000,
                        description="Maximum number of records to return"),
     status: Optional[DownloadStatus] = Query(
         None, description="Filter by status"),
+    before_id: Optional[int] = Query(
+        None, ge=1,
+        description="Return records with id below this cursor; pass the last id of the previous page"),
     service: DownloadService = Depends(get_download_service)
 ):
     """
     Get all downloads with optional filtering
 
-    - **skip**: Number of records to skip (pagination)
+    - **before_id**: Keyset cursor; the last id of the previous page
+    - **skip**: Number of records to skip (deprecated OFFSET pagination)
     - **limit**: Maximum number of records to return
     - **status**: Filter by download status
     """
-    downloads = await service.get_all_downloads(skip=skip, limit=limit, status=status)
+    downloads = await service.get_all_downloads(
+        skip=skip, limit=limit, status=status, before_id=before_id)
     return downloads
 
 
-@router.get("/active", response_model=List[DownloadResponse])
+@router.get("/active", response_model=List[DownloadResponse],
+            response_model_exclude_none=True)
 async def get_active_downloads(
     service: DownloadService = Depends(get_download_service)
 ):
@@ -320,7 +328,8 @@ async def get_playlist_info(
         )
 
 
-@router.post("/batch", response_model=List[DownloadResponse], status_code=status.HTTP_201_CREATED)
+@router.post("/batch", response_model=List[DownloadResponse], status_code=status.HTTP_201_CREATED,
+             response_model_exclude_none=True)
 # Stricter limit for batch
 @limiter.limit(f"{settings.RATE_LIMIT_PER_HOUR}/hour")
 async def create_batch_downloads(
@@ -351,7 +360,7 @@ async def create_batch_downloads(
 
         for download_request in requests:
             # SECURITY: Sanitize URL to prevent command injection
-            download_request.url = sanitize_url(download_request.url)
+            download_request.url = sanitize_url(str(download_request.url))
 
             # Create download record
             download = await service.create_download(download_request)
@@ -38,6 +38,7 @@ class Settings(BaseSettings):
     HOST: str = "127.0.0.1"
     PORT: int = 8000
     RELOAD: bool = True
+    WORKERS: int = 1  # Uvicorn worker processes (ignored when RELOAD is on)
 
     # CORS Settings
     CORS_ORIGINS: List[str] = [
@@ -108,11 +109,15 @@ class Settings(BaseSettings):
     # Automatically clean up downloads older than this (days)
     DOWNLOAD_EXPIRY_DAYS: int = 7
     ENABLE_AUTO_CLEANUP: bool = False  # Enable scheduled cleanup
+    CLEANUP_INTERVAL_MINUTES: int = 60  # Minutes between scheduled cleanups
 
     # Rate Limiting
     RATE_LIMIT_ENABLED: bool = False
     RATE_LIMIT_PER_MINUTE: int = 60  # Requests per minute
     RATE_LIMIT_PER_HOUR: int = 10000  # Requests per hour
+    # Optional Redis backend for rate limiting (shared across workers).
+    # Leave unset to use the in-process limiter.
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
 
     # Local media serving (opt-in)
     # WARNING: Enabling this exposes files on disk to the running server.
@@ -9,14 +9,34 @@ from typing import Generator
 from app.config import settings
 
 # Create database engine
+#
+# SQLite talks to a local file, so pooling is a non-issue there; for
+# server databases (PostgreSQL in production) the default pool of 5+10
+# stalls once concurrent downloads plus API traffic exceed it, so size
+# it to the configured download concurrency with headroom.
+if "sqlite" in settings.DATABASE_URL:
+    _engine_kwargs = {"connect_args": {"check_same_thread": False}}
+else:
+    _engine_kwargs = {
+        "pool_size": max(20, settings.MAX_CONCURRENT_DOWNLOADS * 2),
+        "max_overflow": max(40, settings.MAX_CONCURRENT_DOWNLOADS * 4),
+        "pool_pre_ping": True,  # Drop stale connections before use
+        "pool_recycle": 3600,
+    }
+
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=settings.DEBUG  # Log SQL queries in debug mode
+    echo=settings.DEBUG,  # Log SQL queries in debug mode
+    **_engine_kwargs
 )
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False keeps attributes populated after commit, so
+# returning a just-written object does not trigger a re-SELECT per
+# attribute access; paths that need server-generated values refresh
+# explicitly
+SessionLocal = sessionmaker(autocommit=False, autoflush=False,
+                            expire_on_commit=False, bind=engine)
 
 # Create base class for models
 Base = declarative_base()
@@ -8,11 +8,13 @@ from app.api.routes import local_media
 from app.api.routes import persistent_media
 from fastapi import FastAPI, Request, status, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
-from typing import Any, cast
-from slowapi import Limiter, _rate_limit_exceeded_handler
+from functools import lru_cache
+import asyncio
+from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
@@ -44,7 +46,7 @@ from app.core.security import (
 )
 
 # Configure logging with rotation
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, MemoryHandler
 
 # SECURITY: Log rotation to prevent disk fill
 try:
@@ -83,71 +85,155 @@ if sys.platform == "win32":
             # Best-effort fallback: ignore if we cannot reconfigure/wrap the stream
             pass
 
+# Buffer file-log writes so records hit disk in batches rather than one
+# write syscall per record; errors flush immediately, and a periodic task
+# in lifespan flushes the tail every second
+mem_handler = MemoryHandler(
+    capacity=256,
+    flushLevel=logging.ERROR,
+    target=log_handler,
+    flushOnClose=True
+)
+
 logging.basicConfig(
     level=getattr(logging, settings.LOG_LEVEL.upper()),
     format=settings.LOG_FORMAT,
     handlers=[
         console_handler,
-        log_handler
+        mem_handler
     ]
 )
 logger = logging.getLogger(__name__)
 
 
+def _probe(path: str) -> bool:
+    """Existence check with a single stat syscall (no separate path-walk)"""
+    try:
+        os.stat(path)
+        return True
+    except OSError:
+        return False
+
+
+@lru_cache(maxsize=8)
+def _exists_cached(path: str, bucket: int) -> bool:
+    """
+    Existence probe cached per 30-second bucket
+
+    The bucket argument changes every 30s, so stale entries age out of
+    the LRU naturally and a binary installed after startup is noticed
+    within half a minute.
+    """
+    return _probe(path)
+
+
+async def _flush_logs():
+    """Flush buffered log records every second so the file never lags far"""
+    while True:
+        await asyncio.sleep(1.0)
+        mem_handler.flush()
+
+
+async def _periodic_cleanup():
+    """Run download cleanup on a fixed interval (opt-in via ENABLE_AUTO_CLEANUP)"""
+    interval = settings.CLEANUP_INTERVAL_MINUTES * 60
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            stats = await asyncio.to_thread(
+                DownloadCleaner.cleanup_old_downloads)
+            if stats["files_deleted"] > 0:
+                logger.info(
+                    "Auto-cleanup removed %s files (%s bytes)",
+                    stats["files_deleted"], stats["bytes_freed"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Periodic download cleanup failed")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Lifespan context manager for startup and shutdown events
     """
     # Startup
-    print("[*] Starting Universal Media Downloader API...")
-    print(f"[*] Version: {settings.APP_VERSION}")
-    print(f"[*] Debug Mode: {settings.DEBUG}")
-
-    # Initialize directories
-    init_directories()
-    print(f"[*] Download directory: {settings.DOWNLOAD_DIR}")
-
-    # Initialize database
-    init_db()
+    logger.info("Starting Universal Media Downloader API...")
+    logger.info("Version: %s", settings.APP_VERSION)
+    logger.info("Debug Mode: %s", settings.DEBUG)
+
+    # Directory creation, database init, and binary probes are mutually
+    # independent; overlap them instead of running them serially
+    _, _, ytdlp_exists, ffmpeg_exists = await asyncio.gather(
+        asyncio.to_thread(init_directories),
+        asyncio.to_thread(init_db),
+        asyncio.to_thread(_probe, settings.YTDLP_PATH),
+        asyncio.to_thread(_probe, settings.FFMPEG_PATH)
+    )
+    logger.info("Download directory: %s", settings.DOWNLOAD_DIR)
 
-    # Start download queue
+    # Start download queue (needs the database ready)
     download_queue = get_download_queue()
     await download_queue.start()
 
-    # Check for external tools
-    ytdlp_exists = os.path.exists(settings.YTDLP_PATH)
-    ffmpeg_exists = os.path.exists(settings.FFMPEG_PATH)
+    # Cache for /api/health so orchestrator probes don't re-stat the
+    # binaries on every poll
+    app.state.ytdlp_available = ytdlp_exists
+    app.state.ffmpeg_available = ffmpeg_exists
 
-    print(f"[*] yt-dlp available: {ytdlp_exists}")
-    print(f"[*] FFmpeg available: {ffmpeg_exists}")
+    logger.info("yt-dlp available: %s", ytdlp_exists)
+    logger.info("FFmpeg available: %s", ffmpeg_exists)
 
     if not ytdlp_exists:
-        print("[!] WARNING: yt-dlp.exe not found! Downloads will not work.")
-        print(f"    Expected location: {settings.YTDLP_PATH}")
+        logger.warning(
+            "yt-dlp.exe not found! Downloads will not work. "
+            "Expected location: %s", settings.YTDLP_PATH)
 
     if not ffmpeg_exists:
-        print("[!] WARNING: ffmpeg.exe not found! Video processing may fail.")
-        print(f"    Expected location: {settings.FFMPEG_PATH}")
+        logger.warning(
+            "ffmpeg.exe not found! Video processing may fail. "
+            "Expected location: %s", settings.FFMPEG_PATH)
+
+    # Scheduled download cleanup (opt-in) so expired files are removed
+    # without anyone hitting the admin endpoint
+    cleanup_task = None
+    if settings.ENABLE_AUTO_CLEANUP:
+        cleanup_task = asyncio.create_task(_periodic_cleanup())
+
+    log_flush_task = asyncio.create_task(_flush_logs())
 
-    print("[+] Application startup complete!\n")
+    logger.info("Application startup complete!")
 
     yield
 
     # Shutdown
-    print("\n[*] Shutting down YouTube Downloader API...")
+    logger.info("Shutting down YouTube Downloader API...")
+
+    log_flush_task.cancel()
+    if cleanup_task:
+        cleanup_task.cancel()
 
     # Stop download queue
     download_queue = get_download_queue()
     await download_queue.stop()
 
-    print("[+] Shutdown complete!")
+    logger.info("Shutdown complete!")
 
 
 # Create rate limiter
+# With RATE_LIMIT_REDIS_URL set, slowapi's limits backend keeps a
+# moving window in Redis so enforcement is shared across uvicorn
+# workers instead of each worker counting (and resetting) on its own.
+_limiter_storage = {}
+if settings.RATE_LIMIT_REDIS_URL:
+    _limiter_storage = {
+        "storage_uri": settings.RATE_LIMIT_REDIS_URL,
+        "strategy": "moving-window",
+    }
 limiter = Limiter(
     key_func=get_remote_address,
-    enabled=settings.RATE_LIMIT_ENABLED
+    enabled=settings.RATE_LIMIT_ENABLED,
+    **_limiter_storage
 )
 
 # Create FastAPI app
@@ -156,6 +242,9 @@ app = FastAPI(
     version=settings.APP_VERSION,
     description="Professional universal media downloader API",
     lifespan=lifespan,
+    # orjson serializes datetimes/enums natively in C, which matters for
+    # the download-list endpoints that emit many DownloadResponse objects
+    default_response_class=ORJSONResponse,
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json"
@@ -170,60 +259,162 @@ app.mount(
 
 # Attach limiter to app state
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, cast(
-    Any, _rate_limit_exceeded_handler))
+
+# slowapi's default handler builds a JSONResponse with stdlib json per
+# rejection; the body never varies, so render it once and reuse it.
+# 429s spike exactly when the server is under pressure.
+_RATE_LIMITED_RESPONSE = ORJSONResponse(
+    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+    content={"error": "RateLimitExceeded", "detail": "Too many requests"},
+    headers={"Retry-After": "60"}
+)
+
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    """Return the precomputed 429 response for slowapi rejections"""
+    return _RATE_LIMITED_RESPONSE
 
 
 # ============================================================================
 # Middleware
 # ============================================================================
 
-# Security Headers Middleware
-@app.middleware("http")
-async def add_security_headers(request: Request, call_next):
-    """Add security headers to all responses"""
-    response = await call_next(request)
+# NOTE: each middleware registration wraps the previous ones, so the LAST
+# one registered here runs FIRST on a request. The fused CoreMiddleware is
+# registered first (innermost) so requests rejected by the rate limit or
+# HTTPS redirect skip its logging and header work entirely.
+
+# The 413 payload never varies, so render it to bytes once at import
+_REQUEST_TOO_LARGE_RESPONSE = ORJSONResponse(
+    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    content={
+        "error": "RequestTooLarge",
+        "detail": f"Request body too large. Maximum size: {settings.MAX_REQUEST_SIZE} bytes"
+    }
+)
 
-    # Security headers
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    response.headers["Content-Security-Policy"] = "default-src 'self'"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-    response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
 
-    return response
+class CoreMiddleware:
+    """
+    Fused ASGI middleware: request-size rejection, security headers, and
+    request logging in a single layer
 
+    Each @app.middleware("http") decorator wraps the app in Starlette's
+    BaseHTTPMiddleware, which spawns a task and a stream pair per request;
+    a plain ASGI callable does the same work without that overhead.
+    """
 
-# HTTPS Redirect Middleware (production only)
-@app.middleware("http")
-async def https_redirect(request: Request, call_next):
-    """Redirect HTTP to HTTPS in production"""
-    if should_redirect_to_https(request):
-        https_url = get_https_redirect_url(request)
-        return JSONResponse(
-            status_code=status.HTTP_301_MOVED_PERMANENTLY,
-            headers={"Location": https_url},
-            content={"detail": "Redirecting to HTTPS"}
-        )
-    return await call_next(request)
+    # Pre-encoded to bytes so adding them is one list-extend of constants
+    # rather than seven MutableHeaders assignments per response
+    SECURITY_HEADERS = [
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-frame-options", b"DENY"),
+        (b"x-xss-protection", b"1; mode=block"),
+        (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+        (b"content-security-policy", b"default-src 'self'"),
+        (b"referrer-policy", b"strict-origin-when-cross-origin"),
+        (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+    ]
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Health probes fire constantly (orchestrators poll ~1Hz); don't
+        # let them dominate the access log. They still get the security
+        # headers — only timing and logging are skipped.
+        if scope["path"] == "/api/health":
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = (
+                        list(message["headers"]) + self.SECURITY_HEADERS)
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
+            return
+
+        client = scope.get("client")
+        client_host = client[0] if client else "unknown"
+
+        # SECURITY: Check Content-Length to reject oversized requests
+        # before the body is read. Scanning the raw ASGI header list
+        # avoids materializing a Headers multidict per request; uvicorn
+        # also enforces limits at the server level.
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    if int(value) > settings.MAX_REQUEST_SIZE:
+                        logger.warning(
+                            "Request too large from %s: %s bytes (max: %s)",
+                            client_host, value.decode("latin-1"),
+                            settings.MAX_REQUEST_SIZE)
+                        await _REQUEST_TOO_LARGE_RESPONSE(
+                            scope, receive, send)
+                        return
+                except ValueError:
+                    pass  # Invalid Content-Length header
+                break
+
+        # Skip even the clock read when the record would be suppressed
+        log_enabled = logger.isEnabledFor(logging.INFO)
+        start_time = time.perf_counter() if log_enabled else 0.0
+        status_code = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = (
+                    list(message["headers"]) + self.SECURITY_HEADERS)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+        # One record per request; the isEnabledFor guard skips even the
+        # argument packing when INFO is filtered out
+        if log_enabled:
+            logger.info(
+                "%s %s %s -> %s (%.3fs)",
+                client_host, scope["method"], scope["path"],
+                status_code, time.perf_counter() - start_time
+            )
+
+
+# Registered first so it sits innermost in the middleware stack
+app.add_middleware(CoreMiddleware)
+
+
+# Paths exempt from IP rate limiting: static media streams and API docs
+# dominate request counts but aren't worth spending limiter budget on
+_RATE_LIMIT_EXEMPT_PREFIXES = (
+    "/media/", "/api/docs", "/api/redoc", "/api/openapi.json")
 
 
 # IP-Based Rate Limiting Middleware
 @app.middleware("http")
 async def ip_rate_limit(request: Request, call_next):
     """Apply IP-based rate limiting"""
+    if request.url.path.startswith(_RATE_LIMIT_EXEMPT_PREFIXES):
+        return await call_next(request)
+
     client_ip = request.client.host if request.client else "unknown"
 
-    is_allowed, reason = ip_rate_limiter.is_allowed(client_ip)
+    # Single locked check returns the header values too, so no second
+    # get_stats lookup is needed per request
+    is_allowed, reason, remaining, limit = await ip_rate_limiter.is_allowed(
+        client_ip)
 
     if not is_allowed:
         log_security_event("rate_limit_exceeded", {
             "reason": reason,
             "ip": client_ip
         }, request)
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             content={
                 "error": "RateLimitExceeded",
@@ -238,10 +429,8 @@ async def ip_rate_limit(request: Request, call_next):
 
     # Add rate limit headers to response
     response = await call_next(request)
-    stats = ip_rate_limiter.get_stats(client_ip)
-    response.headers["X-RateLimit-Limit"] = str(stats["minute_limit"])
-    response.headers["X-RateLimit-Remaining"] = str(
-        max(0, stats["minute_limit"] - stats["requests_last_minute"]))
+    response.headers["X-RateLimit-Limit"] = str(limit)
+    response.headers["X-RateLimit-Remaining"] = str(remaining)
 
     return response
 
@@ -251,7 +440,7 @@ async def ip_rate_limit(request: Request, call_next):
 async def get_csrf_token():
     """Get a CSRF token for state-changing requests"""
     token = CSRFProtection.generate_token()
-    response = JSONResponse(content={"csrf_token": token})
+    response = ORJSONResponse(content={"csrf_token": token})
     response.set_cookie(
         key=CSRFProtection.CSRF_COOKIE_NAME,
         value=token,
@@ -262,63 +451,21 @@ async def get_csrf_token():
     return response
 
 
-# Request Size Validation Middleware
+# HTTPS Redirect Middleware (production only)
+# Registered last so it runs first and redirects before any other work
 @app.middleware("http")
-async def validate_request_size(request: Request, call_next):
-    """
-    Validate request size to prevent memory exhaustion attacks
-
-    SECURITY: Check Content-Length header to reject oversized requests early.
-    Note: Uvicorn also enforces --limit-request-line and body limits at the server level.
-    """
-    content_length = request.headers.get("content-length")
-
-    if content_length:
-        try:
-            content_length_int = int(content_length)
-            if content_length_int > settings.MAX_REQUEST_SIZE:
-                client_host = request.client.host if request.client else "unknown"
-                logger.warning(
-                    f"Request too large from {client_host}: "
-                    f"{content_length_int} bytes (max: {settings.MAX_REQUEST_SIZE})"
-                )
-                return JSONResponse(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    content={
-                        "error": "RequestTooLarge",
-                        "detail": f"Request body too large. Maximum size: {settings.MAX_REQUEST_SIZE} bytes"
-                    }
-                )
-        except ValueError:
-            pass  # Invalid Content-Length header
-
+async def https_redirect(request: Request, call_next):
+    """Redirect HTTP to HTTPS in production"""
+    if should_redirect_to_https(request):
+        https_url = get_https_redirect_url(request)
+        return ORJSONResponse(
+            status_code=status.HTTP_301_MOVED_PERMANENTLY,
+            headers={"Location": https_url},
+            content={"detail": "Redirecting to HTTPS"}
+        )
     return await call_next(request)
 
 
-# Request Logging Middleware
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all requests for security monitoring"""
-    start_time = time.time()
-
-    # Log request
-    logger.info(
-        f"Request: {request.method} {request.url.path} "
-        f"from {request.client.host if request.client else 'unknown'}"
-    )
-
-    response = await call_next(request)
-
-    # Log response
-    process_time = time.time() - start_time
-    logger.info(
-        f"Response: {response.status_code} "
-        f"({process_time:.3f}s)"
-    )
-
-    return response
-
-
 # Rate Limiting Middleware
 app.add_middleware(SlowAPIMiddleware)
 
@@ -331,35 +478,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compression Middleware - registered last (outermost) so it compresses
+# the serialized JSON of large download-list responses; small payloads
+# below minimum_size pass through untouched
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 
 # ============================================================================
 # Exception Handlers
 # ============================================================================
 
+# Status codes by exact exception type; the handler falls back to an
+# isinstance scan only for subclasses not registered here
+_EXC_STATUS: dict = {
+    InvalidURLError: status.HTTP_400_BAD_REQUEST,
+    DownloadNotFoundError: status.HTTP_400_BAD_REQUEST,
+    QueueFullError: status.HTTP_429_TOO_MANY_REQUESTS,
+    ServiceUnavailableError: status.HTTP_503_SERVICE_UNAVAILABLE,
+    YTDLPError: status.HTTP_500_INTERNAL_SERVER_ERROR,
+    FFmpegError: status.HTTP_500_INTERNAL_SERVER_ERROR,
+    DownloadError: status.HTTP_500_INTERNAL_SERVER_ERROR,
+}
+
+
 @app.exception_handler(YouTubeDownloaderException)
 async def youtube_downloader_exception_handler(
     request: Request,
     exc: YouTubeDownloaderException
 ):
     """Handle custom application exceptions with appropriate HTTP status codes"""
-    # Determine appropriate status code based on exception type
-    if isinstance(exc, (InvalidURLError, DownloadNotFoundError)):
-        # Client errors - bad request
-        status_code = status.HTTP_400_BAD_REQUEST
-    elif isinstance(exc, QueueFullError):
-        # Too many requests
-        status_code = status.HTTP_429_TOO_MANY_REQUESTS
-    elif isinstance(exc, ServiceUnavailableError):
-        # External service unavailable
-        status_code = status.HTTP_503_SERVICE_UNAVAILABLE
-    elif isinstance(exc, (YTDLPError, FFmpegError, DownloadError)):
-        # Server/processing errors
-        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
-    else:
-        # Default to 500 for unknown YouTubeDownloaderException types
-        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    # O(1) dict lookup for known types; unknown subclasses fall through
+    # to the isinstance scan, then default to 500
+    status_code = _EXC_STATUS.get(type(exc))
+    if status_code is None:
+        status_code = next(
+            (code for cls, code in _EXC_STATUS.items()
+             if isinstance(exc, cls)),
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status_code,
         content={
             "error": exc.__class__.__name__,
@@ -374,7 +532,7 @@ async def general_exception_handler(request: Request, exc: Exception):
     if settings.DEBUG:
         # In debug mode, return detailed error
         import traceback
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={
                 "error": "InternalServerError",
@@ -384,7 +542,7 @@ async def general_exception_handler(request: Request, exc: Exception):
         )
     else:
         # In production, return generic error
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={
                 "error": "InternalServerError",
@@ -412,11 +570,12 @@ async def root():
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
+    bucket = int(time.time()) // 30
     return {
         "status": "healthy",
         "version": settings.APP_VERSION,
-        "ytdlp_available": os.path.exists(settings.YTDLP_PATH),
-        "ffmpeg_available": os.path.exists(settings.FFMPEG_PATH),
+        "ytdlp_available": _exists_cached(settings.YTDLP_PATH, bucket),
+        "ffmpeg_available": _exists_cached(settings.FFMPEG_PATH, bucket),
         "database_ok": True  # TODO: Add actual DB health check
     }
 
@@ -424,8 +583,16 @@ async def health_check():
 @app.get("/api/admin/download-stats")
 async def get_download_stats():
     """Get download storage statistics (admin endpoint)"""
-    stats = DownloadCleaner.get_download_stats()
+    # Serve from a short-lived cache so repeated polling doesn't rescan
+    # the whole download tree
+    cached = getattr(app.state, "download_stats_cache", None)
+    if cached and time.time() - cached[0] < 30:
+        return cached[1]
+
+    # Directory walk is blocking; run it off the event loop
+    stats = await asyncio.to_thread(DownloadCleaner.get_download_stats)
     stats["total_size_human"] = f"{stats['total_size_bytes'] / (1024**3):.2f} GB"
+    app.state.download_stats_cache = (time.time(), stats)
     return stats
 
 
@@ -443,7 +610,9 @@ async def cleanup_downloads(expiry_days: int = 7):
             detail="expiry_days must be at least 1"
         )
 
-    stats = DownloadCleaner.cleanup_old_downloads(expiry_days)
+    # unlink/stat loop is blocking; run it off the event loop
+    stats = await asyncio.to_thread(
+        DownloadCleaner.cleanup_old_downloads, expiry_days)
     stats["bytes_freed_human"] = f"{stats['bytes_freed'] / (1024**2):.2f} MB"
     return stats
 
@@ -484,5 +653,11 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.RELOAD,
-        log_level=settings.LOG_LEVEL.lower()
+        log_level=settings.LOG_LEVEL.lower(),
+        # Pin the fast event loop and HTTP parser instead of relying on
+        # uvicorn's auto-detection; uvloop has no Windows build, so fall
+        # back to auto there
+        loop="uvloop" if sys.platform != "win32" else "auto",
+        http="httptools",
+        workers=1 if settings.RELOAD else settings.WORKERS
     )
@@ -5,7 +5,8 @@ SQLAlchemy ORM models for database tables
 from typing import cast
 import enum
 
-from sqlalchemy import Column, Integer, String, DateTime, Enum as SAEnum, Float, Boolean, Text
+from sqlalchemy import Column, Index, Integer, String, DateTime, Float, Boolean, Text
+from sqlalchemy import Enum as SAEnum
 from sqlalchemy.sql import func
 
 from app.core.database import Base
@@ -46,13 +47,18 @@ class Download(Base):
     duration = Column(Integer)  # Duration in seconds
 
     # Download configuration
-    download_type = Column(SAEnum(DownloadType), default=DownloadType.VIDEO)
+    # Non-native enum: a plain VARCHAR(16) check-constrained column, so
+    # no database ENUM type to migrate, while keeping the baseline's
+    # name storage ("VIDEO", "PENDING") that existing rows hold
+    download_type = Column(
+        SAEnum(DownloadType, native_enum=False, length=16),
+        default=DownloadType.VIDEO)
     format = Column(String, default="mp4")  # mp4, m4a, webm, etc.
     quality = Column(String, default="best")  # best, 1080p, 720p, etc.
     embed_thumbnail = Column(Boolean, default=True)
 
     # Status tracking
-    status = Column(SAEnum(DownloadStatus),
+    status = Column(SAEnum(DownloadStatus, native_enum=False, length=16),
                     default=DownloadStatus.PENDING, index=True)
     progress = Column(Float, default=0.0)  # 0.0 to 100.0
     speed = Column(String)  # Download speed (e.g., "2.5MB/s")
@@ -74,10 +80,21 @@ class Download(Base):
     updated_at = Column(DateTime, onupdate=func.now())
 
     # Playlist info (if applicable)
-    playlist_id = Column(String)  # For grouping playlist downloads
+    # For grouping playlist downloads
+    playlist_id = Column(String, index=True)
     playlist_index = Column(Integer)  # Position in playlist
     playlist_title = Column(String)
 
+    # Composite index for the history/queue queries that filter by
+    # status and order by creation time
+    # (status, id) serves the keyset-paginated listing
+    # (WHERE status = ? AND id < ? ORDER BY id DESC); ascending is
+    # fine — both engines scan the index backward for DESC
+    __table_args__ = (
+        Index("ix_downloads_status_created", "status", "created_at"),
+        Index("ix_downloads_status_id", "status", "id"),
+    )
+
     def __repr__(self) -> str:
         return f"<Download(id={self.id}, title='{self.title}', status={self.status})>"
 
@@ -116,7 +133,8 @@ class UserSettings(Base):
 
     # Download defaults
     default_download_type = Column(
-        SAEnum(DownloadType), default=DownloadType.AUDIO)
+        SAEnum(DownloadType, native_enum=False, length=16),
+        default=DownloadType.AUDIO)
     default_video_quality = Column(String, default="best")
     default_audio_format = Column(String, default="m4a")
     default_embed_thumbnail = Column(Boolean, default=True)
@@ -5,7 +5,7 @@ These are the "contracts" between frontend and backend
 """
 from pydantic import BaseModel, HttpUrl, Field, field_validator
 from datetime import datetime
-from typing import Optional, ClassVar
+from typing import Literal, Optional
 from app.models.database import DownloadStatus, DownloadType
 
 
@@ -15,53 +15,24 @@ from app.models.database import DownloadStatus, DownloadType
 
 class DownloadRequest(BaseModel):
     """Request schema for creating a new download"""
-    url: str = Field(...,
-                     description="Media URL (YouTube, Twitter/X, Instagram, TikTok, etc.)")
+    # SECURITY: HttpUrl and Literal whitelists validate inside
+    # pydantic-core (Rust), preventing injection without Python-level
+    # validator callbacks
+    url: HttpUrl = Field(...,
+                         description="Media URL (YouTube, Twitter/X, Instagram, TikTok, etc.)")
     download_type: DownloadType = Field(
         DownloadType.AUDIO, description="Type of download")
-    quality: str = Field(
-        "best", description="Video quality (best, 1080p, 720p, etc.)")
-    format: str = Field(
-        "m4a", description="Output format (mp4, m4a, webm, etc.)")
+    quality: Literal[
+        "best", "worst", "2160p", "1440p", "1080p", "720p",
+        "480p", "360p", "240p", "144p"
+    ] = Field("best", description="Video quality (best, 1080p, 720p, etc.)")
+    format: Literal[
+        "mp4", "webm", "mkv", "flv", "avi",
+        "m4a", "mp3", "opus", "vorbis", "flac", "wav", "aac"
+    ] = Field("m4a", description="Output format (mp4, m4a, webm, etc.)")
     embed_thumbnail: bool = Field(
         True, description="Embed thumbnail in audio files")
 
-    # SECURITY: Whitelist allowed values to prevent injection
-    ALLOWED_QUALITIES: ClassVar[list[str]] = [
-        "best", "worst", "2160p", "1440p", "1080p", "720p", "480p", "360p", "240p", "144p"]
-    ALLOWED_VIDEO_FORMATS: ClassVar[list[str]] = [
-        "mp4", "webm", "mkv", "flv", "avi"]
-    ALLOWED_AUDIO_FORMATS: ClassVar[list[str]] = [
-        "m4a", "mp3", "opus", "vorbis", "flac", "wav", "aac"]
-
-    @field_validator("url")
-    @classmethod
-    def validate_url(cls, v: str) -> str:
-        """Validate that URL looks like a supported media URL"""
-        # Accept any URL, let backend service check support
-        if not v.lower().startswith("http"):
-            raise ValueError("Must be a valid URL")
-        return v
-
-    @field_validator("quality")
-    @classmethod
-    def validate_quality(cls, v: str) -> str:
-        """SECURITY: Whitelist quality values to prevent command injection"""
-        if v not in cls.ALLOWED_QUALITIES:
-            raise ValueError(
-                f"Quality must be one of: {', '.join(cls.ALLOWED_QUALITIES)}")
-        return v
-
-    @field_validator("format")
-    @classmethod
-    def validate_format(cls, v: str) -> str:
-        """SECURITY: Whitelist format values to prevent command injection"""
-        all_formats = cls.ALLOWED_VIDEO_FORMATS + cls.ALLOWED_AUDIO_FORMATS
-        if v not in all_formats:
-            raise ValueError(
-                f"Format must be one of: {', '.join(all_formats)}")
-        return v
-
     class Config:
         json_schema_extra = {
             "example": {
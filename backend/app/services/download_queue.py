@@ -3,16 +3,21 @@ Download Queue Manager
 Handles background execution of downloads using asyncio
 """
 import asyncio
+import logging
 from typing import Optional
-from datetime import datetime
+
+from sqlalchemy import func
 
 from app.models.database import Download, DownloadStatus, DownloadType, UserSettings
 from app.core.database import SessionLocal
-from app.services.ytdlp_service import YTDLPService
-from app.services.metadata_service import MetadataService
+from app.services.ytdlp_service import get_ytdlp_service
+from app.services.metadata_service import get_metadata_service
+from app.services.progress_buffer import get_progress_buffer
 from app.core.exceptions import YTDLPError, ServiceUnavailableError
 from app.config import settings as app_settings
 
+logger = logging.getLogger(__name__)
+
 
 class DownloadQueue:
     """
@@ -21,12 +26,22 @@ class DownloadQueue:
 
     def __init__(self, max_concurrent: int = 3):
         self.max_concurrent = max_concurrent
-        self.queue: asyncio.Queue = asyncio.Queue()
-        self.active_downloads: set = set()
+        # Bounded so burst traffic applies backpressure instead of
+        # growing the queue without limit; add_download awaits when full
+        self.queue: asyncio.Queue = asyncio.Queue(
+            maxsize=app_settings.MAX_QUEUE_SIZE)
+        # Wake-on-event concurrency gate: the worker blocks here instead
+        # of polling a counter, so an idle or saturated queue costs no
+        # scheduler wakeups
+        self.sem = asyncio.Semaphore(max_concurrent)
         self.running = False
         self.worker_task: Optional[asyncio.Task] = None
-        self.ytdlp = YTDLPService()
-        self.metadata = MetadataService()
+        # Live download/metadata tasks, tracked so stop() can cancel
+        # them instead of abandoning tasks with open sessions
+        self._tasks: set = set()
+        self.ytdlp = get_ytdlp_service()
+        self.metadata = get_metadata_service()
+        self.progress = get_progress_buffer()
 
     async def start(self):
         """Start the download queue worker"""
@@ -34,11 +49,12 @@ class DownloadQueue:
             return
 
         self.running = True
+        await self.progress.start()
         self.worker_task = asyncio.create_task(self._worker())
-        print("[+] Download queue started")
+        logger.info("Download queue started")
 
     async def stop(self):
-        """Stop the download queue worker"""
+        """Stop the download queue worker and any in-flight tasks"""
         self.running = False
         if self.worker_task:
             self.worker_task.cancel()
@@ -46,65 +62,143 @@ class DownloadQueue:
                 await self.worker_task
             except asyncio.CancelledError:
                 pass
-        print("[*] Download queue stopped")
+
+        # Cancel in-flight download/metadata tasks and wait for them to
+        # unwind so sessions are closed before the loop shuts down.
+        # Snapshot first: done callbacks mutate the set as tasks finish.
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await self.progress.stop()
+        logger.info("Download queue stopped")
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """Create a tracked task that removes itself on completion"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
 
     async def add_download(self, download_id: int):
-        """Add a download to the queue"""
+        """
+        Add a download to the queue
+        Awaits while the queue is at MAX_QUEUE_SIZE, so callers should
+        expect this to block under sustained load
+        """
         await self.queue.put(download_id)
-        print(
-            f"[+] Added download {download_id} to queue (queue size: {self.queue.qsize()})")
+        logger.info("Added download %s to queue (queue size: %s)",
+                    download_id, self.queue.qsize())
 
     async def _worker(self):
         """Main worker loop that processes downloads"""
         while self.running:
             try:
-                # Wait for a download or timeout to check if we should stop
-                try:
-                    download_id = await asyncio.wait_for(
-                        self.queue.get(),
-                        timeout=1.0
-                    )
-                except asyncio.TimeoutError:
-                    continue
-
-                # Check if we've hit the concurrent download limit
-                while len(self.active_downloads) >= self.max_concurrent:
-                    await asyncio.sleep(0.5)
-
-                # Process the download
-                self.active_downloads.add(download_id)
-                asyncio.create_task(self._process_download(download_id))
+                # Block until work arrives, then until a slot frees up.
+                # stop() cancels the task, which raises CancelledError out
+                # of either await cleanly.
+                download_id = await self.queue.get()
+                await self.sem.acquire()
+                self._spawn(self._process_download(download_id))
 
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                print(f"[!] Error in download queue worker: {str(e)}")
+                logger.error("Error in download queue worker: %s", e)
                 await asyncio.sleep(1)
 
-    async def _process_download(self, download_id: int):
-        """Process a single download"""
+    def _claim_download(self, download_id: int) -> Optional[Download]:
+        """
+        Mark a download as processing and return a detached copy of it
+        Runs in a worker thread: synchronous session calls block, and
+        blocking the event loop stalls every other task
+        """
         db = SessionLocal()
         try:
-            # Get download from database
             download = db.query(Download).filter(
                 Download.id == download_id).first()
             if not download:
-                print(f"[!] Download {download_id} not found in database")
-                return
+                return None
+
+            download.status = DownloadStatus.PROCESSING
+            # Database-side timestamp: consistent across workers and
+            # avoids mixing naive utcnow/now values
+            download.started_at = func.now()
+            db.commit()
+            db.refresh(download)
+            db.expunge(download)
+            return download
+        finally:
+            db.close()
 
-            # Get custom download location from user settings
+    @staticmethod
+    def _get_download_dir() -> str:
+        """Resolve the download directory from user settings (thread)"""
+        db = SessionLocal()
+        try:
             user_settings = db.query(UserSettings).first()
-            custom_download_dir = None
             if user_settings and user_settings.download_location:
-                custom_download_dir = user_settings.download_location
-            else:
-                custom_download_dir = str(app_settings.DOWNLOAD_DIR)
+                return str(user_settings.download_location)
+            return str(app_settings.DOWNLOAD_DIR)
+        finally:
+            db.close()
 
-            # Update status to processing
-            download.status = DownloadStatus.PROCESSING
-            download.started_at = datetime.utcnow()
+    @staticmethod
+    def _finish_download(download_id: int, status: DownloadStatus,
+                         file_path: Optional[str] = None,
+                         error_message: Optional[str] = None
+                         ) -> Optional[Download]:
+        """
+        Record the terminal state of a download (thread)
+        Returns the detached row so follow-up work (metadata) can use it
+        without another SELECT
+        """
+        db = SessionLocal()
+        try:
+            download = db.query(Download).filter(
+                Download.id == download_id).first()
+            if not download:
+                return None
+            download.status = status
+            if file_path is not None:
+                download.file_path = file_path
+                download.progress = 100
+                download.completed_at = func.now()
+            if error_message is not None:
+                download.error_message = error_message
             db.commit()
-            print(f"[*] Starting download {download_id}: {download.title}")
+            db.refresh(download)
+            db.expunge(download)
+            return download
+        finally:
+            db.close()
+
+    async def _process_download(self, download_id: int):
+        """Process a single download"""
+        try:
+            download = await asyncio.to_thread(
+                self._claim_download, download_id)
+            if not download:
+                logger.warning(
+                    "Download %s not found in database", download_id)
+                return
+
+            custom_download_dir = await asyncio.to_thread(
+                self._get_download_dir)
+            logger.info("Starting download %s: %s",
+                        download_id, download.title)
+
+            # yt-dlp progress lines arrive many times per second from
+            # the downloader thread; the buffer coalesces them into
+            # periodic bulk writes instead of a commit per line
+            def _on_progress(info: dict) -> None:
+                self.progress.record(
+                    download_id,
+                    progress=info.get("progress"),
+                    speed=info.get("speed"),
+                    eta=info.get("eta"),
+                )
 
             # Execute the download based on type
             try:
@@ -113,6 +207,7 @@ class DownloadQueue:
                         url=download.url,
                         format=download.format,
                         embed_thumbnail=True,
+                        progress_callback=_on_progress,
                         custom_download_dir=custom_download_dir
                     )
                 elif download.download_type == DownloadType.VIDEO:
@@ -120,63 +215,70 @@ class DownloadQueue:
                         url=download.url,
                         quality=download.quality,
                         format=download.format,
+                        progress_callback=_on_progress,
                         custom_download_dir=custom_download_dir
                     )
                 else:
                     raise ValueError(
                         f"Unsupported download type: {download.download_type}")
 
-                # Download succeeded
-                download.status = DownloadStatus.COMPLETED
-                download.file_path = file_path
-                download.progress = 100
-                download.completed_at = datetime.utcnow()
-                db.commit()
-                print(f"[+] Download {download_id} completed: {file_path}")
+                # Download succeeded; drop any buffered progress so a
+                # late flush cannot overwrite the terminal state
+                self.progress.discard(download_id)
+                completed = await asyncio.to_thread(
+                    self._finish_download, download_id,
+                    DownloadStatus.COMPLETED, file_path)
+                logger.info("Download %s completed: %s",
+                            download_id, file_path)
 
                 # Automatically extract metadata and generate thumbnail
-                print(f"[*] Processing metadata for download {download_id}")
-                asyncio.create_task(self._process_metadata_async(download_id))
+                if completed is not None:
+                    logger.info(
+                        "Processing metadata for download %s", download_id)
+                    self._spawn(self._process_metadata_async(completed))
 
             except (YTDLPError, ServiceUnavailableError) as e:
                 # Download failed
-                download.status = DownloadStatus.FAILED
-                download.error_message = str(e)
-                db.commit()
-                print(f"[!] Download {download_id} failed: {str(e)}")
+                self.progress.discard(download_id)
+                await asyncio.to_thread(
+                    self._finish_download, download_id,
+                    DownloadStatus.FAILED, None, str(e))
+                logger.error("Download %s failed: %s", download_id, e)
 
         except Exception as e:
-            print(
-                f"[!] Unexpected error processing download {download_id}: {str(e)}")
+            logger.exception(
+                "Unexpected error processing download %s", download_id)
+            self.progress.discard(download_id)
             try:
-                download = db.query(Download).filter(
-                    Download.id == download_id).first()
-                if download:
-                    download.status = DownloadStatus.FAILED
-                    download.error_message = f"Internal error: {str(e)}"
-                    db.commit()
-            except:
+                await asyncio.to_thread(
+                    self._finish_download, download_id,
+                    DownloadStatus.FAILED, None, f"Internal error: {str(e)}")
+            except Exception:
                 pass
 
         finally:
-            self.active_downloads.discard(download_id)
-            db.close()
+            self.sem.release()
 
-    async def _process_metadata_async(self, download_id: int):
+    async def _process_metadata_async(self, download: Download):
         """
         Process metadata in a background task
         Extracts duration and generates thumbnail for a completed download
+
+        Receives the detached row from _finish_download; merging it with
+        load=False reattaches the already-refreshed state without the
+        SELECT a plain merge or re-query would issue
         """
         # Use a new DB session for background processing
         db = SessionLocal()
         try:
-            download = db.query(Download).filter(
-                Download.id == download_id).first()
-            if download and download.status == DownloadStatus.COMPLETED:
+            if download.status == DownloadStatus.COMPLETED:
+                download = await asyncio.to_thread(
+                    db.merge, download, load=False)
                 await self.metadata.process_download(download, db)
         except Exception as e:
-            print(
-                f"[!] Error in background metadata processing for download {download_id}: {e}")
+            logger.error(
+                "Error in background metadata processing for download %s: %s",
+                download.id, e)
         finally:
             db.close()
 
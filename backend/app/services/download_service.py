@@ -2,58 +2,94 @@
 Download Service
 Business logic for managing downloads and building media URLs
 """
-from app.config import settings
-from app.core.exceptions import DownloadNotFoundError, InvalidURLError
-from app.services.ytdlp_service import YTDLPService
-from app.models.schemas import DownloadRequest, DownloadResponse
-from app.models.database import Download, DownloadStatus
-from sqlalchemy.orm import Session
-import requests
+import asyncio
 import os
+import threading
+import time
 from pathlib import Path
-from datetime import datetime
 from typing import Any, List, Optional
-from typing import Any
-from sqlalchemy import desc
-from typing import List, Optional
-from typing import List, Optional, Any
-"""
-Download Service
-Business logic for managing downloads and building media URLs
-"""
 
+import httpx
+from pydantic import TypeAdapter
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session, load_only
 
-def _make_absolute_media_urls(data: dict) -> dict:
-    from urllib.parse import urlparse
-    try:
-        scheme = "https" if getattr(settings, "FORCE_HTTPS", False) else "http"
-        host = getattr(settings, "HOST", "127.0.0.1")
-        port = getattr(settings, "PORT", 8000)
-        base = f"{scheme}://{host}:{port}"
-
-        for key in ("thumbnail_url", "media_url"):
-            val = data.get(key)
-            if not val or not isinstance(val, str):
-                continue
-            parsed = urlparse(val)
-            if parsed.scheme:
-                continue
-            if not val.startswith("/"):
-                val = "/" + val
-            data[key] = base + val
-    except Exception:
-        pass
-    return data
+from app.config import settings
+from app.core.exceptions import DownloadNotFoundError, InvalidURLError
+from app.services.ytdlp_service import get_ytdlp_service
+from app.models.schemas import DownloadRequest, DownloadResponse
+from app.models.database import Download, DownloadStatus
+
+# Hoisted out of the per-row helpers: DOWNLOAD_DIR.resolve() is a chain
+# of syscalls and the backend base never changes after startup, so both
+# are computed once at import instead of per response row.
+_DOWNLOAD_BASE = str(settings.DOWNLOAD_DIR.resolve())
+
+# Validates whole result sets in one pydantic-core pass instead of a
+# Python-level model_validate call per row
+_DL_LIST_ADAPTER = TypeAdapter(List[DownloadResponse])
+
+# Stats are a read-mostly aggregate polled by dashboards; a short TTL
+# absorbs that traffic while writes through this service invalidate
+# eagerly. Queue-side status flips are only visible after the TTL.
+_STATS_TTL = 2.0
+_stats_cache: dict = {"at": 0.0, "val": None}
+_stats_lock = threading.Lock()
+
+
+# Every column DownloadResponse serializes, and nothing else: listing
+# them lets the list queries skip hydrating columns the response never
+# reads (embed_thumbnail, retry_count, updated_at, playlist_id). Any
+# field added to DownloadResponse must be added here too, or each row
+# would lazy-load it individually.
+_RESPONSE_COLUMNS = load_only(
+    Download.id, Download.url, Download.title, Download.thumbnail_url,
+    Download.duration, Download.download_type, Download.format,
+    Download.quality, Download.status, Download.progress, Download.speed,
+    Download.eta, Download.file_path, Download.file_size, Download.file_name,
+    Download.error_message, Download.created_at, Download.started_at,
+    Download.completed_at, Download.playlist_title, Download.playlist_index,
+)
+
+
+def _invalidate_stats_cache() -> None:
+    with _stats_lock:
+        _stats_cache["val"] = None
+
+
+# Shared client so media-URL probes reuse connections; lives for the
+# process, like the engine
+_http_client = httpx.AsyncClient(timeout=5.0, follow_redirects=True)
+_BACKEND_BASE = "{}://{}:{}".format(
+    "https" if getattr(settings, "FORCE_HTTPS", False) else "http",
+    getattr(settings, "HOST", "127.0.0.1"),
+    getattr(settings, "PORT", 8000),
+)
+
+
+def _absolutize_urls(resp: DownloadResponse) -> DownloadResponse:
+    """Make relative thumbnail/media URLs absolute, mutating in place"""
+    for key in ("thumbnail_url", "media_url"):
+        val = getattr(resp, key)
+        # "://" within the first few chars means a scheme is present —
+        # all we need to know here, without a urlparse per value
+        if not val or val.startswith(_BACKEND_BASE) or "://" in val[:10]:
+            continue
+        if not val.startswith("/"):
+            val = "/" + val
+        setattr(resp, key, _BACKEND_BASE + val)
+    return resp
 
 
 def _build_media_url_from_path(file_path: str) -> Optional[str]:
     try:
-        p = Path(file_path)
-        resolved = p.resolve(strict=False)
-        download_dir = settings.DOWNLOAD_DIR.resolve()
-        if not str(resolved).startswith(str(download_dir)):
-            return None
-        rel = str(resolved).replace(str(download_dir), "").lstrip("/\\")
+        if not file_path.startswith(_DOWNLOAD_BASE):
+            # Downloader records absolute paths; resolve only as a
+            # fallback for legacy relative/symlinked entries
+            file_path = str(Path(file_path).resolve(strict=False))
+            if not file_path.startswith(_DOWNLOAD_BASE):
+                return None
+        rel = file_path.removeprefix(_DOWNLOAD_BASE).lstrip("/\\")
         return f"/media/{rel.replace(os.sep, '/')}"
     except Exception:
         return None
@@ -69,7 +105,7 @@ def _set_attr(obj: Any, name: str, value: Any) -> None:
 class DownloadService:
     def __init__(self, db: Session):
         self.db = db
-        self.ytdlp = YTDLPService()
+        self.ytdlp = get_ytdlp_service()
 
     async def create_download(self, request: DownloadRequest) -> DownloadResponse:
         if not self.ytdlp.is_valid_url(request.url):
@@ -98,109 +134,119 @@ class DownloadService:
         self.db.add(download)
         self.db.commit()
         self.db.refresh(download)
+        _invalidate_stats_cache()
 
         resp = DownloadResponse.model_validate(download)
         if resp.file_path:
-            media_url = _build_media_url_from_path(resp.file_path)
-            if media_url:
-                data = resp.model_dump()
-                data['media_url'] = media_url
-                data = _make_absolute_media_urls(data)
-                return DownloadResponse.model_validate(data)
-        return resp
-
-    async def get_all_downloads(self, skip: int = 0, limit: int = 100, status: Optional[DownloadStatus] = None) -> List[DownloadResponse]:
-        query = self.db.query(Download).order_by(Download.id.desc())
+            resp.media_url = _build_media_url_from_path(resp.file_path)
+        return _absolutize_urls(resp)
+
+    async def get_all_downloads(self, skip: int = 0, limit: int = 100,
+                                status: Optional[DownloadStatus] = None,
+                                before_id: Optional[int] = None) -> List[DownloadResponse]:
+        query = self.db.query(Download).options(_RESPONSE_COLUMNS)
         if status is not None:
             query = query.filter(Download.status == status)
-        downloads = query.offset(skip).limit(limit).all()
-
-        results: List[DownloadResponse] = []
-        for d in downloads:
-            resp = DownloadResponse.model_validate(d)
+        # Keyset pagination: WHERE id < cursor walks the PK index in
+        # O(limit) regardless of depth, where OFFSET must scan and
+        # discard `skip` rows first. The last row's id is the next
+        # cursor. `skip` remains as the deprecated fallback.
+        # order_by must precede offset/limit: Query raises
+        # InvalidRequestError the other way around.
+        query = query.order_by(Download.id.desc())
+        if before_id is not None:
+            query = query.filter(Download.id < before_id)
+        else:
+            query = query.offset(skip)
+        query = query.limit(limit)
+        # Synchronous session I/O runs in a thread so it cannot stall
+        # the event loop while the database responds
+        downloads = await asyncio.to_thread(query.all)
+
+        results = _DL_LIST_ADAPTER.validate_python(
+            downloads, from_attributes=True)
+        for resp in results:
             if resp.file_path:
-                media_url = _build_media_url_from_path(resp.file_path)
-                if media_url:
-                    data = resp.model_dump()
-                    data['media_url'] = media_url
-                    data = _make_absolute_media_urls(data)
-                    results.append(DownloadResponse.model_validate(data))
-                    continue
-            results.append(resp)
+                resp.media_url = _build_media_url_from_path(resp.file_path)
+            _absolutize_urls(resp)
         return results
 
     async def get_active_downloads(self) -> List[DownloadResponse]:
-        downloads = self.db.query(Download).filter(
-            Download.status.in_([
-                DownloadStatus.DOWNLOADING,
-                DownloadStatus.PROCESSING,
-                DownloadStatus.QUEUED,
-            ])
-        ).all()
-
-        results: List[DownloadResponse] = []
-        for d in downloads:
-            resp = DownloadResponse.model_validate(d)
+        downloads = await asyncio.to_thread(
+            lambda: self.db.query(Download).options(_RESPONSE_COLUMNS).filter(
+                Download.status.in_([
+                    DownloadStatus.DOWNLOADING,
+                    DownloadStatus.PROCESSING,
+                    DownloadStatus.QUEUED,
+                ])
+            ).all())
+
+        results = _DL_LIST_ADAPTER.validate_python(
+            downloads, from_attributes=True)
+        for resp in results:
             if resp.file_path:
-                media_url = _build_media_url_from_path(resp.file_path)
-                if media_url:
-                    data = resp.model_dump()
-                    data['media_url'] = media_url
-                    data = _make_absolute_media_urls(data)
-                    results.append(DownloadResponse.model_validate(data))
-                    continue
-            results.append(resp)
+                resp.media_url = _build_media_url_from_path(resp.file_path)
+            _absolutize_urls(resp)
         return results
 
     async def get_download(self, download_id: int) -> DownloadResponse:
-        download = self.db.query(Download).filter(
-            Download.id == download_id).first()
+        # Session.get hits the identity map before emitting SQL, so a
+        # row already loaded in this request costs no round trip
+        download = self.db.get(Download, download_id)
         if not download:
             raise DownloadNotFoundError(f"Download {download_id} not found")
         resp = DownloadResponse.model_validate(download)
         if resp.file_path:
-            media_url = _build_media_url_from_path(resp.file_path)
-            if media_url:
-                data = resp.model_dump()
-                data['media_url'] = media_url
-                data = _make_absolute_media_urls(data)
-                return DownloadResponse.model_validate(data)
-        return resp
+            resp.media_url = _build_media_url_from_path(resp.file_path)
+        return _absolutize_urls(resp)
 
     async def update_download_status(self, download_id: int, status: DownloadStatus, progress: Optional[float] = None, speed: Optional[str] = None, eta: Optional[str] = None, error_message: Optional[str] = None) -> DownloadResponse:
-        download = self.db.query(Download).filter(
-            Download.id == download_id).first()
-        if not download:
-            raise DownloadNotFoundError(f"Download {download_id} not found")
-
-        _set_attr(download, 'status', status)
+        # One UPDATE statement instead of load + flush + refresh: this
+        # runs on every progress tick, so skipping ORM materialization
+        # and change tracking matters
+        changes: dict = {"status": status}
         if progress is not None:
-            _set_attr(download, 'progress', progress)
+            changes["progress"] = progress
         if speed is not None:
-            _set_attr(download, 'speed', speed)
+            changes["speed"] = speed
         if eta is not None:
-            _set_attr(download, 'eta', eta)
+            changes["eta"] = eta
         if error_message is not None:
-            _set_attr(download, 'error_message', error_message)
+            changes["error_message"] = error_message
 
-        if status == DownloadStatus.DOWNLOADING and download.started_at is None:
-            _set_attr(download, 'started_at', datetime.now())
+        if status == DownloadStatus.DOWNLOADING:
+            # SQL-side COALESCE keeps the first transition's timestamp;
+            # func.now() lets the database stamp it consistently
+            changes["started_at"] = func.coalesce(
+                Download.started_at, func.now())
         if status == DownloadStatus.COMPLETED:
-            _set_attr(download, 'completed_at', datetime.now())
-            _set_attr(download, 'progress', 100.0)
-
-        self.db.commit()
-        self.db.refresh(download)
+            changes["completed_at"] = func.now()
+            changes["progress"] = 100.0
+
+        def _apply() -> Optional[Download]:
+            result = self.db.execute(
+                update(Download)
+                .where(Download.id == download_id)
+                .values(**changes)
+            )
+            self.db.commit()
+            if result.rowcount == 0:
+                return None
+            # populate_existing forces a re-SELECT: a copy already in
+            # the identity map would otherwise serve attributes from
+            # before the bulk UPDATE (expire_on_commit is off)
+            return self.db.get(
+                Download, download_id, populate_existing=True)
+
+        download = await asyncio.to_thread(_apply)
+        if not download:
+            raise DownloadNotFoundError(f"Download {download_id} not found")
+        _invalidate_stats_cache()
 
         resp = DownloadResponse.model_validate(download)
         if resp.file_path:
-            media_url = _build_media_url_from_path(resp.file_path)
-            if media_url:
-                data = resp.model_dump()
-                data['media_url'] = media_url
-                data = _make_absolute_media_urls(data)
-                return DownloadResponse.model_validate(data)
-        return resp
+            resp.media_url = _build_media_url_from_path(resp.file_path)
+        return _absolutize_urls(resp)
 
 
     async def update_download_file_info(
@@ -213,13 +259,14 @@ class DownloadService:
         """
         Update file information for a download
         """
-        download = self.db.query(Download).filter(
-            Download.id == download_id).first()
+        download = self.db.get(Download, download_id)
 
         if not download:
             raise DownloadNotFoundError(f"Download {download_id} not found")
 
-        _set_attr(download, 'file_path', file_path)
+        # Canonicalize once at write time so the read paths can strip
+        # the download-dir prefix with plain string ops, no syscalls
+        _set_attr(download, 'file_path', os.path.realpath(file_path))
 
         if file_size is not None:
             _set_attr(download, 'file_size', file_size)
@@ -227,32 +274,26 @@ class DownloadService:
         if file_name is not None:
             _set_attr(download, 'file_name', file_name)
 
+        # No refresh: every written value is already known Python-side
         self.db.commit()
-        self.db.refresh(download)
 
         resp = DownloadResponse.model_validate(download)
         if resp.file_path:
-            rel = str(Path(resp.file_path).resolve()).replace(
-                str(settings.DOWNLOAD_DIR.resolve()), "").lstrip("/\\")
-            media_url = f"/media/{rel.replace(os.sep, '/')}"
-            data = resp.model_dump()
-            data["media_url"] = media_url
-            data = _make_absolute_media_urls(data)
-            return DownloadResponse.model_validate(data)
-        return resp
+            resp.media_url = _build_media_url_from_path(resp.file_path)
+        return _absolutize_urls(resp)
 
     async def delete_download(self, download_id: int) -> bool:
         """
         Delete a download record
         """
-        download = self.db.query(Download).filter(
-            Download.id == download_id).first()
+        download = self.db.get(Download, download_id)
 
         if not download:
             raise DownloadNotFoundError(f"Download {download_id} not found")
 
         self.db.delete(download)
         self.db.commit()
+        _invalidate_stats_cache()
 
         return True
 
@@ -269,8 +310,7 @@ class DownloadService:
         """
         Retry a failed download
         """
-        download = self.db.query(Download).filter(
-            Download.id == download_id).first()
+        download = self.db.get(Download, download_id)
 
         if not download:
             raise DownloadNotFoundError(f"Download {download_id} not found")
@@ -281,87 +321,74 @@ class DownloadService:
         # increment retry_count safely
         _set_attr(download, 'retry_count', (download.retry_count or 0) + 1)
 
+        # No refresh: every written value is already known Python-side
         self.db.commit()
-        self.db.refresh(download)
+        _invalidate_stats_cache()
 
         resp = DownloadResponse.model_validate(download)
         if resp.file_path:
-            rel = str(Path(resp.file_path).resolve()).replace(
-                str(settings.DOWNLOAD_DIR.resolve()), "").lstrip("/\\")
-            media_url = f"/media/{rel.replace('\\\\', '/')}"
-            data = resp.model_dump()
-            data["media_url"] = media_url
-            data = _make_absolute_media_urls(data)
-            return DownloadResponse.model_validate(data)
-        return resp
+            resp.media_url = _build_media_url_from_path(resp.file_path)
+        return _absolutize_urls(resp)
 
     async def get_download_stats(self) -> dict:
         """
         Get statistics about downloads
         """
-        total = self.db.query(Download).count()
-        pending = self.db.query(Download).filter(
-            Download.status == DownloadStatus.PENDING
-        ).count()
-        downloading = self.db.query(Download).filter(
-            Download.status == DownloadStatus.DOWNLOADING
-        ).count()
-        completed = self.db.query(Download).filter(
-            Download.status == DownloadStatus.COMPLETED
-        ).count()
-        failed = self.db.query(Download).filter(
-            Download.status == DownloadStatus.FAILED
-        ).count()
-
-        return {
-            "total": total,
-            "pending": pending,
-            "downloading": downloading,
-            "completed": completed,
-            "failed": failed
+        with _stats_lock:
+            if (_stats_cache["val"] is not None
+                    and time.monotonic() - _stats_cache["at"] < _STATS_TTL):
+                return _stats_cache["val"]
+
+        # One GROUP BY round trip instead of five COUNT(*) queries;
+        # total is summed locally from the buckets
+        rows = self.db.query(
+            Download.status, func.count(Download.id)
+        ).group_by(Download.status).all()
+        counts = dict(rows)
+
+        stats = {
+            "total": sum(counts.values()),
+            "pending": counts.get(DownloadStatus.PENDING, 0),
+            "downloading": counts.get(DownloadStatus.DOWNLOADING, 0),
+            "completed": counts.get(DownloadStatus.COMPLETED, 0),
+            "failed": counts.get(DownloadStatus.FAILED, 0)
         }
+        with _stats_lock:
+            _stats_cache["at"] = time.monotonic()
+            _stats_cache["val"] = stats
+        return stats
 
     async def validate_media_urls(self, data: dict) -> dict:
         """
         Validate and normalize media URLs in the download data
         """
-        media_urls = [
-            data.get("media_url"),
-            data.get("thumbnail_url")
+        full_urls = [
+            _BACKEND_BASE + mu
+            for mu in (data.get("media_url"), data.get("thumbnail_url"))
+            if mu
         ]
+        if not full_urls:
+            return data
 
-        # Base URL for constructing absolute URLs
-        scheme = "https" if getattr(settings, "FORCE_HTTPS", False) else "http"
-        host = getattr(settings, "HOST", "127.0.0.1")
-        port = getattr(settings, "PORT", 8000)
-        base = f"{scheme}://{host}:{port}"
-
-        # iterate candidate media url fragments and validate them
-        for mu in media_urls:
-            # skip empty fragments
-            if not mu:
-                continue
-
-            full_url = base + mu
-            resp = None
-            results = {}
-
+        async def _probe(url: str) -> None:
             try:
                 # prefer lightweight HEAD first
-                resp = requests.head(full_url, timeout=5, allow_redirects=True)
+                resp = await _http_client.head(url)
                 if resp.status_code != 200:
                     # fallback to GET if HEAD not successful
-                    resp = requests.get(full_url, timeout=5, stream=True)
-                results = resp.headers if resp is not None else {}
-            except requests.RequestException:
-                # network error or timeout; treat as no headers
-                results = {}
+                    await _http_client.get(url)
+            except httpx.HTTPError:
+                # network error or timeout; non-fatal
+                pass
+
+        # Probe candidates concurrently off the event loop's back
+        await asyncio.gather(*(_probe(u) for u in full_urls))
 
-            # assign media_url after attempting validation (even if headers empty)
+        # assign media_url after attempting validation (even if probing failed)
+        for full_url in full_urls:
             data["media_url"] = full_url
             # Prefer original thumbnail_url if present
-            if "thumbnail_url" not in data or not data["thumbnail_url"]:
+            if not data.get("thumbnail_url"):
                 data["thumbnail_url"] = full_url
 
         return data
-        media_url = f"/media/{rel.replace(os.sep, '/')}"
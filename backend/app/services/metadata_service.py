@@ -3,8 +3,10 @@ Metadata Service
 Automatically generates thumbnails and extracts metadata for completed downloads
 """
 import subprocess
-import re
 import asyncio
+import logging
+import os
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 from sqlalchemy.orm import Session
@@ -12,6 +14,10 @@ from sqlalchemy.orm import Session
 from app.models.database import Download, DownloadType
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+_THUMBS_DIR = settings.DOWNLOAD_DIR / "Thumbnails"
+
 
 class MetadataService:
     """Service for extracting metadata and generating thumbnails from media files"""
@@ -19,16 +25,31 @@ class MetadataService:
     def __init__(self):
         self.ffmpeg_path = self._find_ffmpeg()
         self.ffprobe_path = self._find_ffprobe()
+        # Bounds concurrent ffmpeg/ffprobe processes so a burst of
+        # completed downloads cannot fork one per file at once
+        self._ff_sem = asyncio.Semaphore(max(2, os.cpu_count() or 2))
+        # Ensure the thumbnail target exists once per process instead of
+        # re-running mkdir on every completed download
+        _THUMBS_DIR.mkdir(parents=True, exist_ok=True)
 
-    def _find_ffmpeg(self) -> str:
-        """Locate ffmpeg executable"""
+    async def _run_ff(self, fn, *args):
+        """Run one ffmpeg/ffprobe helper in a thread, semaphore-bounded"""
+        async with self._ff_sem:
+            return await asyncio.to_thread(fn, *args)
+
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _find_ffmpeg() -> str:
+        """Locate ffmpeg executable (stat once per process)"""
         # Use configured FFMPEG_PATH from settings
         if settings.FFMPEG_PATH.exists():
             return str(settings.FFMPEG_PATH)
         return "ffmpeg"  # fallback to PATH
 
-    def _find_ffprobe(self) -> str:
-        """Locate ffprobe executable"""
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _find_ffprobe() -> str:
+        """Locate ffprobe executable (stat once per process)"""
         # Check same directory as ffmpeg
         ffprobe_path = settings.BASE_DIR / "ffprobe.exe"
         if ffprobe_path.exists():
@@ -36,23 +57,29 @@ class MetadataService:
         return "ffprobe"  # fallback to PATH
 
     def _get_duration(self, file_path: str) -> Optional[float]:
-        """Extract duration from media file using ffmpeg"""
+        """Extract duration from media file using ffprobe"""
         try:
+            # ffprobe prints just the duration in seconds: no demux of
+            # the whole header and no stderr banner to regex through
             result = subprocess.run(
-                [self.ffmpeg_path, "-i", file_path],
+                [
+                    self.ffprobe_path, "-v", "error",
+                    "-show_entries", "format=duration",
+                    "-of", "default=nw=1:nk=1",
+                    file_path
+                ],
                 capture_output=True,
                 text=True,
                 encoding="utf-8",
                 errors="replace",
                 timeout=30
             )
-            stderr = result.stderr
-            match = re.search(r"Duration: (\d\d):(\d\d):(\d\d)\.(\d+)", stderr)
-            if match:
-                h, m, s, ms = match.groups()
-                return int(h) * 3600 + int(m) * 60 + int(s) + float(f"0.{ms}")
+            value = result.stdout.strip()
+            if result.returncode == 0 and value:
+                return float(value)
         except Exception as e:
-            print(f"[!] Failed to extract duration from {file_path}: {e}")
+            logger.error(
+                "Failed to extract duration from %s: %s", file_path, e)
         return None
 
     def _create_thumbnail(self, file_path: str, output_path: str) -> bool:
@@ -89,7 +116,8 @@ class MetadataService:
             )
             return result.returncode == 0 and Path(output_path).exists()
         except Exception as e:
-            print(f"[!] Failed to create thumbnail for {file_path}: {e}")
+            logger.error(
+                "Failed to create thumbnail for %s: %s", file_path, e)
         return False
 
     async def _allocate_sequential_number(self, video_dir: Path) -> int:
@@ -104,16 +132,21 @@ class MetadataService:
         async with self._numbering_lock:
             used_numbers = set()
             try:
-                for f in video_dir.iterdir():
-                    if f.is_file():
-                        # Match stems like "Video_01", "Video_123"
-                        m = re.match(r"^Video_(\d{2,})$", f.stem)
-                        if m:
-                            try:
-                                used_numbers.add(int(m.group(1)))
-                            except ValueError:
-                                pass
-            except Exception:
+                # os.scandir iterates at C level with the file type from
+                # the dirent, so large directories cost no per-entry
+                # stat or Path allocation; match stems like "Video_01",
+                # "Video_123" with plain string checks instead of a
+                # regex per file
+                with os.scandir(video_dir) as entries:
+                    for entry in entries:
+                        name = entry.name
+                        if not name.startswith("Video_") or not entry.is_file():
+                            continue
+                        stem = name.rpartition(".")[0] if "." in name else name
+                        num = stem[6:]
+                        if len(num) >= 2 and num.isdigit():
+                            used_numbers.add(int(num))
+            except OSError:
                 # If directory iteration fails, fall back to 1
                 pass
 
@@ -138,12 +171,12 @@ class MetadataService:
         file_path_str: Optional[str] = download.file_path  # type: ignore
 
         if not file_path_str:
-            print(f"[!] No file_path for download {download.id}")
+            logger.warning("No file_path for download %s", download.id)
             return False
 
         file_path = Path(file_path_str)
         if not file_path.exists():
-            print(f"[!] File not found: {file_path}")
+            logger.warning("File not found: %s", file_path)
             return False
 
         try:
@@ -154,7 +187,14 @@ class MetadataService:
             # Only use continuous numbering for VIDEO downloads; otherwise default to DB id
             dl_type = getattr(download, "download_type", None)
             if dl_type == DownloadType.VIDEO or dl_type == getattr(DownloadType, "VIDEO", None) or dl_type == "VIDEO":
-                sequential_num = await self._allocate_sequential_number(video_dir)
+                # Already sequentially named (e.g. re-processed row):
+                # reuse the number from the stem instead of rescanning
+                # the directory under the allocation lock
+                stem = file_path.stem
+                if stem.startswith("Video_") and len(stem) >= 8 and stem[6:].isdigit():
+                    sequential_num = int(stem[6:])
+                else:
+                    sequential_num = await self._allocate_sequential_number(video_dir)
             else:
                 sequential_num = download.id  # type: ignore
 
@@ -169,38 +209,54 @@ class MetadataService:
                 download.file_path = str(new_video_path)  # type: ignore
                 download.file_name = new_video_name  # type: ignore
                 download.title = f"Video_{sequential_num:02d}"  # type: ignore
-                print(f"[+] Renamed video to: {new_video_name}")
+                logger.info("Renamed video to: %s", new_video_name)
+
+            # Prepare thumbnail target with sequential naming
+            thumb_name = f"Thumbnail_{sequential_num:02d}.jpg"
+            thumb_path = _THUMBS_DIR / thumb_name
+
+            # Duration probe and thumbnail render are independent
+            # subprocesses; run them in parallel worker threads instead
+            # of serially on the event loop
+            duration, thumb_ok = await asyncio.gather(
+                self._run_ff(self._get_duration, str(file_path)),
+                self._run_ff(
+                    self._create_thumbnail, str(file_path), str(thumb_path)),
+            )
 
-            # Extract duration
-            duration = self._get_duration(str(file_path))
             if duration:
                 download.duration = duration  # type: ignore
-                print(
-                    f"[+] Extracted duration for download {download.id}: {duration:.2f}s")
+                logger.info("Extracted duration for download %s: %.2fs",
+                            download.id, duration)
 
             # Update file metadata
             download.file_size = file_path.stat().st_size  # type: ignore
 
-            # Generate thumbnail with sequential naming
-            thumbs_dir = settings.DOWNLOAD_DIR / "Thumbnails"
-            thumbs_dir.mkdir(parents=True, exist_ok=True)
-
-            thumb_name = f"Thumbnail_{sequential_num:02d}.jpg"
-            thumb_path = thumbs_dir / thumb_name
-
-            if self._create_thumbnail(str(file_path), str(thumb_path)):
+            if thumb_ok:
                 # Update the thumbnail_url using SQLAlchemy's update pattern
                 setattr(download, "thumbnail_url",
                         f"/media/Thumbnails/{thumb_name}")
-                print(f"[+] Created thumbnail for download {download.id}")
+                logger.info(
+                    "Created thumbnail for download %s", download.id)
             else:
-                print(
-                    f"[*] Could not create thumbnail for download {download.id}")
+                logger.info(
+                    "Could not create thumbnail for download %s", download.id)
 
             db.commit()
             return True
 
         except Exception as e:
-            print(
-                f"[!] Error processing metadata for download {download.id}: {e}")
+            logger.error(
+                "Error processing metadata for download %s: %s",
+                download.id, e)
             return False
+
+
+@lru_cache(maxsize=1)
+def get_metadata_service() -> MetadataService:
+    """
+    Get the shared MetadataService instance
+    Construction probes the filesystem for ffmpeg/ffprobe; the service
+    is stateless per call, so one instance serves every caller
+    """
+    return MetadataService()
@@ -0,0 +1,126 @@
+"""
+Progress Buffer
+Batches per-download progress updates into periodic bulk database writes
+"""
+import asyncio
+import logging
+import threading
+from typing import Optional
+
+from sqlalchemy import update
+
+from app.models.database import Download
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressBuffer:
+    """
+    Accumulates progress/speed/eta updates in memory and flushes them to
+    the database in one transaction on a fixed interval.
+
+    yt-dlp emits progress lines many times per second per active
+    download; committing each one costs a transaction (and on SQLite an
+    fsync) per line. Buffering trades sub-second staleness for a bounded
+    write rate. Terminal status transitions should bypass the buffer and
+    commit directly so completion is never delayed.
+    """
+
+    def __init__(self, flush_interval: float = 0.25):
+        self.flush_interval = flush_interval
+        # Pending values keyed by Download.id; later updates for the same
+        # download overwrite earlier ones, so only the freshest state is
+        # ever written
+        self._pending: dict = {}
+        # Progress callbacks arrive from download worker threads
+        self._lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.running = False
+
+    def record(self, download_id: int, progress: Optional[float] = None,
+               speed: Optional[str] = None, eta: Optional[str] = None):
+        """Buffer one progress update (cheap; no database work)"""
+        values = {}
+        if progress is not None:
+            values["progress"] = progress
+        if speed is not None:
+            values["speed"] = speed
+        if eta is not None:
+            values["eta"] = eta
+        if not values:
+            return
+
+        with self._lock:
+            existing = self._pending.get(download_id)
+            if existing is None:
+                self._pending[download_id] = values
+            else:
+                existing.update(values)
+
+    async def start(self):
+        """Start the periodic flush task"""
+        if self.running:
+            return
+        self.running = True
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush task and write out anything still buffered"""
+        self.running = False
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def flush(self):
+        """Write all buffered updates in one transaction"""
+        with self._lock:
+            if not self._pending:
+                return
+            items = self._pending
+            self._pending = {}
+
+        try:
+            await asyncio.to_thread(self._flush_sync, items)
+        except Exception as e:
+            logger.error("Progress flush failed: %s", e)
+
+    def discard(self, download_id: int):
+        """Drop buffered updates for a download (e.g. after cancellation)"""
+        with self._lock:
+            self._pending.pop(download_id, None)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    @staticmethod
+    def _flush_sync(items: dict):
+        db = SessionLocal()
+        try:
+            for download_id, values in items.items():
+                db.execute(
+                    update(Download)
+                    .where(Download.id == download_id)
+                    .values(**values)
+                )
+            db.commit()
+        finally:
+            db.close()
+
+
+# Global buffer instance
+_progress_buffer: Optional[ProgressBuffer] = None
+
+
+def get_progress_buffer() -> ProgressBuffer:
+    """Get the global progress buffer instance"""
+    global _progress_buffer
+    if _progress_buffer is None:
+        _progress_buffer = ProgressBuffer()
+    return _progress_buffer
@@ -9,6 +9,9 @@ import asyncio
 import json
 import re
 import os
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Optional, Callable, Dict, Any
 from pathlib import Path
 
@@ -26,7 +29,18 @@ class YTDLPService:
     Handles video info extraction, download, and progress tracking
     """
 
+    # Video-info probes take hundreds of ms to seconds; repeat requests
+    # for the same URL (retries, duplicate pastes) within the TTL reuse
+    # the previous result
+    INFO_CACHE_TTL = 300.0
+    INFO_CACHE_MAX = 512
+
     def __init__(self):
+        # TTL cache of url -> (fetched_at, info), oldest-first
+        self._info_cache: OrderedDict = OrderedDict()
+        # In-flight probes keyed by url so concurrent duplicate requests
+        # share one subprocess (singleflight)
+        self._info_inflight: Dict[str, asyncio.Task] = {}
         self.ytdlp_path = str(settings.YTDLP_PATH)
         self.ffmpeg_path = str(settings.FFMPEG_PATH)
         self.download_dir = str(settings.DOWNLOAD_DIR)
@@ -211,7 +225,34 @@ class YTDLPService:
         """
         Extract video information without downloading
         Returns metadata like title, duration, thumbnail, etc.
+        Results are cached for INFO_CACHE_TTL seconds, and concurrent
+        requests for the same URL share a single probe
         """
+        cached = self._info_cache.get(url)
+        if cached is not None:
+            if time.monotonic() - cached[0] < self.INFO_CACHE_TTL:
+                return cached[1]
+            del self._info_cache[url]
+
+        task = self._info_inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_video_info(url))
+            self._info_inflight[url] = task
+            task.add_done_callback(
+                lambda _t: self._info_inflight.pop(url, None))
+        # Awaiting a shared task does not cancel it if one waiter is
+        # cancelled; failures propagate to every waiter
+        return await task
+
+    def _cache_info(self, url: str, info: Dict[str, Any]) -> None:
+        """Store a probe result, evicting the oldest entry at capacity"""
+        self._info_cache[url] = (time.monotonic(), info)
+        self._info_cache.move_to_end(url)
+        while len(self._info_cache) > self.INFO_CACHE_MAX:
+            self._info_cache.popitem(last=False)
+
+    async def _fetch_video_info(self, url: str) -> Dict[str, Any]:
+        """Run the actual yt-dlp probe (uncached)"""
         self._check_ytdlp_available()
 
         if not self.is_valid_url(url):
@@ -220,7 +261,9 @@ class YTDLPService:
 
         try:
             # Use to_thread to avoid blocking (Windows-compatible)
-            return await asyncio.to_thread(self._get_video_info_sync, url)
+            info = await asyncio.to_thread(self._get_video_info_sync, url)
+            self._cache_info(url, info)
+            return info
         except subprocess.TimeoutExpired:
             raise YTDLPError("Video info extraction timed out")
         except subprocess.CalledProcessError as e:
@@ -233,7 +276,10 @@ class YTDLPService:
                         settings.COOKIE_BROWSER)
                     if exported:
                         settings.COOKIES_FILE = exported
-                        return await asyncio.to_thread(self._get_video_info_sync, url)
+                        info = await asyncio.to_thread(
+                            self._get_video_info_sync, url)
+                        self._cache_info(url, info)
+                        return info
                 except Exception:
                     pass
             raise YTDLPError(msg)
@@ -744,3 +790,14 @@ class YTDLPService:
         except Exception as e:
             print(f"[!] Unexpected error getting yt-dlp version: {str(e)}")
             return "Unknown (error)"
+
+
+@lru_cache(maxsize=1)
+def get_ytdlp_service() -> YTDLPService:
+    """
+    Get the shared YTDLPService instance
+    Construction probes the filesystem for yt-dlp/ffmpeg and a JS
+    runtime; the service is stateless per call, so one instance serves
+    every request
+    """
+    return YTDLPService()